@@ -45,6 +45,7 @@ class ContentLocalfile(Base):
 class ContentContentnode(Base):
     __tablename__ = "content_contentnode"
     __table_args__ = (
+        Index("cn_desc_cid_idx", "tree_id", "lft", "kind", "content_id"),
         Index(
             "content_contentnode_level_channel_id_available_29f0bb18_idx",
             "level",
@@ -221,6 +222,7 @@ class ContentContentnodeTags(Base):
 
 class ContentFile(Base):
     __tablename__ = "content_file"
+    __table_args__ = (Index("file_lf_cn_idx", "local_file_id", "contentnode_id"),)
 
     id = Column(CHAR(32), primary_key=True)
     supplementary = Column(Boolean, nullable=False)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-15 20:35
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0035_add_imscp_preset"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contentnode",
+            index=models.Index(
+                fields=["tree_id", "lft", "kind", "content_id"], name="cn_desc_cid_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-15 21:02
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0036_contentnode_descendant_content_id_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contentrequest",
+            index=models.Index(
+                fields=["type", "status", "requested_at"], name="creq_type_status_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-15 21:08
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0037_contentrequest_type_status_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contentnode",
+            index=models.Index(fields=["content_id", "id"], name="cn_cid_id_idx"),
+        ),
+    ]
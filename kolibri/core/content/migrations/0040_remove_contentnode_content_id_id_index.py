@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 01:22
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0039_file_local_file_contentnode_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="contentnode",
+            name="cn_cid_id_idx",
+        ),
+    ]
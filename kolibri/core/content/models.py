@@ -22,17 +22,21 @@ Django ORM for these calculations).
 """
 from __future__ import print_function
 
+import concurrent.futures
 import os
-import uuid
+from functools import lru_cache
 from gettext import gettext as _
 
 from django.db import connection
 from django.db import models
+from django.db import transaction
 from django.db.models import Exists
-from django.db.models import F
-from django.db.models import Min
+from django.db.models import Lookup
 from django.db.models import OuterRef
+from django.db.models import Q
 from django.db.models import QuerySet
+from django.db.models.lookups import Exact
+from django.db.models.sql.where import AND
 from django.utils.encoding import python_2_unicode_compatible
 from le_utils.constants import content_kinds
 from le_utils.constants import format_presets
@@ -57,6 +61,10 @@ from kolibri.utils.time_utils import local_now
 
 PRESET_LOOKUP = dict(format_presets.choices)
 
+UNKNOWN_PRESET = _("Unknown format")
+
+DELETE_FILE_WORKERS = 8
+
 
 @python_2_unicode_compatible
 class ContentTag(base_models.ContentTag):
@@ -64,8 +72,71 @@ class ContentTag(base_models.ContentTag):
         return self.tag_name
 
 
+class HasAllBits(Lookup):
+    """
+    Filters for values that have all of the given bits set, doing the bitwise AND
+    directly in the WHERE clause rather than annotating the masked value onto every row.
+    """
+
+    lookup_name = "hasallbits"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            "(%s & %s) = %s" % (lhs, rhs, rhs),
+            lhs_params + rhs_params + rhs_params,
+        )
+
+
+models.BigIntegerField.register_lookup(HasAllBits)
+
+
+@lru_cache(maxsize=2048)
+def _get_label_bits(field_name, labels):
+    """
+    Combine the bits for a set of labels by bitmask field name, cached as the
+    same label filters are requested repeatedly.
+    """
+    bitmasks = metadata_bitmasks[field_name]
+    bits = {}
+    for label in labels:
+        if label in bitmasks:
+            bitmask_fieldname = bitmasks[label]["bitmask_field_name"]
+            bits[bitmask_fieldname] = (
+                bits.get(bitmask_fieldname, 0) | bitmasks[label]["bits"]
+            )
+    # Return an immutable value, as it is shared between calls
+    return tuple(bits.items())
+
+
 class ContentNodeQueryset(TreeQuerySet, FilterByUUIDQuerysetMixin):
-    def dedupe_by_content_id(self, use_distinct=True):
+    def _is_filtered_by_pk(self):
+        where = self.query.where
+        if where.connector != AND or where.negated or not self.query.tables:
+            return False
+        # Only a lookup on the primary key of the base table limits the queryset to
+        # one node, the primary key of a joined table can match many nodes.
+        base_alias = self.query.tables[0]
+        return any(
+            isinstance(child, Exact)
+            and getattr(child.lhs, "target", None) == self.model._meta.pk
+            and getattr(child.lhs, "alias", None) == base_alias
+            for child in where.children
+        )
+
+    def dedupe_by_content_id(self, use_distinct=True, assume_unique=False):
+        """
+        Remove duplicate content nodes based on content_id.
+
+        If the caller knows that the queryset can only contain one node per content_id,
+        e.g. because it is a single node lookup, assume_unique can be passed to skip the
+        deduplication entirely. A queryset filtered to a single primary key is always
+        returned as is. Note that filtering on channel_id and content_id is not enough,
+        as the same content can appear at multiple places within a channel.
+        """
+        if assume_unique or self._is_filtered_by_pk():
+            return self
         # Cannot use distinct if queryset is also going to use annotate,
         # so optional use_distinct flag can be used to fallback to a subquery
         # remove duplicate content nodes based on content_id
@@ -73,21 +144,26 @@ class ContentNodeQueryset(TreeQuerySet, FilterByUUIDQuerysetMixin):
             if connection.vendor == "postgresql":
                 # Create a subquery of all contentnodes deduped by content_id
                 # to avoid calling distinct on an annotated queryset.
-                deduped_ids = self.model.objects.order_by("content_id").distinct(
+                deduped_ids = self.model.objects.order_by("content_id", "id").distinct(
                     "content_id"
                 )
-            else:
-                # adapted from https://code.djangoproject.com/ticket/22696
-                deduped_ids = (
-                    self.values("content_id")
-                    .annotate(node_id=Min("id"))
-                    .values_list("node_id", flat=True)
+                return self.filter_by_uuids(deduped_ids)
+            # Keep only the node with the lowest id for each content_id, by excluding
+            # any node for which a node with the same content_id and a lower id exists
+            # in this queryset. This is a single anti-join against the content_id index,
+            # rather than a GROUP BY subquery that is then matched back with an IN.
+            return self.annotate(
+                has_lower_duplicate=Exists(
+                    self.filter(
+                        content_id=OuterRef("content_id"), id__lt=OuterRef("id")
+                    ).values("id")
                 )
-            return self.filter_by_uuids(deduped_ids)
+            ).filter(has_lower_duplicate=False)
 
-        # when using postgres, we can call distinct on a specific column
+        # when using postgres, we can call distinct on a specific column,
+        # ordering by id as well so that the lowest id is kept
         elif connection.vendor == "postgresql":
-            return self.order_by("content_id").distinct("content_id")
+            return self.order_by("content_id", "id").distinct("content_id")
 
     def filter_by_content_ids(self, content_ids, validate=True):
         return self._by_uuids(content_ids, validate, "content_id", True)
@@ -96,31 +172,17 @@ class ContentNodeQueryset(TreeQuerySet, FilterByUUIDQuerysetMixin):
         return self._by_uuids(content_ids, validate, "content_id", False)
 
     def has_all_labels(self, field_name, labels):
-        bitmasks = metadata_bitmasks[field_name]
-        bits = {}
-        for label in labels:
-            if label in bitmasks:
-                bitmask_fieldname = bitmasks[label]["bitmask_field_name"]
-                if bitmask_fieldname not in bits:
-                    bits[bitmask_fieldname] = 0
-                bits[bitmask_fieldname] += bitmasks[label]["bits"]
-
-        filters = {}
-        annotations = {}
-        for bitmask_fieldname, bits in bits.items():
-            annotation_fieldname = "{}_{}".format(bitmask_fieldname, "masked")
-            # To get the correct result, i.e. an AND that all the labels are present,
-            # we need to check that the aggregated value is euqal to the bits.
-            # If we wanted an OR (which would check for any being present),
-            # we would have to use GREATER THAN 0 here.
-            filters[annotation_fieldname] = bits
-            # This ensures that the annotated value is the result of the AND operation
-            # so if all the values are present, the result will be the same as the bits
-            # but if any are missing, it will not be equal to the bits, but will only be
-            # 0 if none of the bits are present.
-            annotations[annotation_fieldname] = F(bitmask_fieldname).bitand(bits)
-
-        return self.annotate(**annotations).filter(**filters)
+        bits = _get_label_bits(field_name, frozenset(labels))
+
+        # To get the correct result, i.e. an AND that all the labels are present,
+        # we check that the masked value is equal to the bits, rather than greater
+        # than 0, which would check for any being present.
+        return self.filter(
+            **{
+                "{}__{}".format(bitmask_fieldname, HasAllBits.lookup_name): field_bits
+                for bitmask_fieldname, field_bits in bits
+            }
+        )
 
 
 class ContentNodeManager(
@@ -163,21 +225,27 @@ class ContentNodeManager(
 
         stack = []
 
-        def treeify(data, cursor=1, level=0):
-            data = dict(data)
-            children = data.pop("children", [])
-            node = self.model(**data)
+        # Walk the tree iteratively rather than recursively, so that deep trees
+        # cannot exceed the recursion limit. Each entry on the work list is either
+        # the data for a node to create, or a created node whose descendants
+        # have all been visited, so that its right value can now be set.
+        tree_cursor = cursor - 1
+        work = [(data, level)]
+        while work:
+            item, node_level = work.pop()
+            tree_cursor += 1
+            if node_level is None:
+                setattr(item, opts.right_attr, tree_cursor)
+                continue
+            node = self.model(**{k: v for k, v in item.items() if k != "children"})
             stack.append(node)
             setattr(node, opts.tree_id_attr, tree_id)
-            setattr(node, opts.level_attr, level)
-            setattr(node, opts.left_attr, cursor)
-            for child in children:
-                cursor = treeify(child, cursor=cursor + 1, level=level + 1)
-            cursor += 1
-            setattr(node, opts.right_attr, cursor)
-            return cursor
-
-        treeify(data, cursor=cursor, level=level)
+            setattr(node, opts.level_attr, node_level)
+            setattr(node, opts.left_attr, tree_cursor)
+            work.append((node, None))
+            work.extend(
+                (child, node_level + 1) for child in reversed(item.get("children", []))
+            )
 
         if target:
             self._create_space(2 * len(stack), cursor - 1, tree_id)
@@ -227,6 +295,12 @@ class ContentNode(base_models.ContentNode):
             ["level", "channel_id", "kind"],
             ["level", "channel_id", "available"],
         ]
+        indexes = [
+            # Covers the descendant content_id lookup so it can be an index only scan
+            models.Index(
+                fields=["tree_id", "lft", "kind", "content_id"], name="cn_desc_cid_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -237,7 +311,9 @@ class ContentNode(base_models.ContentNode):
         descendants of this node.
         """
         return (
-            ContentNode.objects.filter(lft__gte=self.lft, lft__lte=self.rght)
+            ContentNode.objects.filter(
+                tree_id=self.tree_id, lft__gte=self.lft, lft__lte=self.rght
+            )
             .exclude(kind=content_kinds.TOPIC)
             .values_list("content_id", flat=True)
         )
@@ -262,6 +338,10 @@ class File(base_models.File):
 
     class Meta:
         ordering = ["priority"]
+        indexes = [
+            # Lets the unused file check find the nodes for a local file from the index
+            models.Index(fields=["local_file", "contentnode"], name="file_lf_cn_idx"),
+        ]
 
     class Admin:
         pass
@@ -279,22 +359,36 @@ class File(base_models.File):
         """
         Return the preset.
         """
-        return PRESET_LOOKUP.get(self.preset, _("Unknown format"))
+        return PRESET_LOOKUP.get(self.preset, UNKNOWN_PRESET)
+
+
+def _delete_unused_file(file):
+    try:
+        os.remove(
+            paths.get_content_storage_file_path(paths.get_content_file_name(file))
+        )
+        return True, file
+    except (IOError, OSError, InvalidStorageFilenameError):
+        return False, file
 
 
 class LocalFileQueryset(models.QuerySet, FilterByUUIDQuerysetMixin):
     def delete_unused_files(self):
-        for file in self.get_unused_files().values("id", "extension"):
-            try:
-                os.remove(
-                    paths.get_content_storage_file_path(
-                        paths.get_content_file_name(file)
-                    )
-                )
-                yield True, file
-            except (IOError, OSError, InvalidStorageFilenameError):
-                yield False, file
-        self.get_unused_files().update(available=False)
+        # Take a snapshot of the unused files so that we only evaluate the query once,
+        # and mark exactly the files we are going to delete as unavailable.
+        # This is done before deleting them, so that no file is left marked as
+        # available once it has been removed, even if the caller stops iterating.
+        files = list(self.get_unused_files().values("id", "extension"))
+        for i in range(0, len(files), BATCH_SIZE):
+            self.filter_by_uuids(
+                [file["id"] for file in files[i : i + BATCH_SIZE]], validate=False
+            ).update(available=False)
+        # Deleting files is bound by disk latency, so delete them concurrently.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=DELETE_FILE_WORKERS
+        ) as executor:
+            for result in executor.map(_delete_unused_file, files):
+                yield result
 
     def get_orphan_files(self):
         return self.filter(files__isnull=True)
@@ -307,9 +401,9 @@ class LocalFileQueryset(models.QuerySet, FilterByUUIDQuerysetMixin):
             self.filter(available=True)
             .annotate(
                 has_available_contentnode=Exists(
-                    ContentNode.objects.filter(available=True)
-                    .filter(files__local_file=OuterRef("id"))
-                    .values("id")
+                    File.objects.filter(
+                        local_file_id=OuterRef("id"), contentnode__available=True
+                    ).values("id")
                 )
             )
             .filter(has_available_contentnode=False)
@@ -353,7 +447,8 @@ class LocalFile(base_models.LocalFile):
             deleted = False
 
         self.available = False
-        self.save()
+        # Only write the available column, rather than saving every field
+        type(self).objects.filter(pk=self.pk).update(available=False)
         return deleted
 
 
@@ -405,23 +500,46 @@ class ChannelMetadata(base_models.ChannelMetadata):
         return self.name
 
     def delete_content_tree_and_files(self):
-        # Use Django ORM to ensure cascading delete:
-        right_value = self.root.rght
-        # Disable MPTT updates during the deletion as everything
-        # is being deleted anyway, so no need to make any updates!
-        with ContentNode.objects.disable_mptt_updates():
-            if right_value // 2 > BATCH_SIZE:
-                # If there are more than 1000 nodes in the tree, delete in batches to limit memory usage
-                left_value = self.root.lft
-                while left_value < right_value:
-                    qs = ContentNode.objects.filter(
-                        lft__gt=left_value,
-                        rght__lt=left_value + BATCH_SIZE,
-                        tree_id=self.root.tree_id,
-                    )
-                    qs.delete()
-                    left_value += BATCH_SIZE
-            self.root.delete()
+        """
+        Delete this channel and its content tree.
+
+        Rather than relying on the ORM's cascading delete, which fetches every node
+        of the tree and sends delete signals for each of them, delete the rows that
+        reference the tree in bulk, one statement per model, and the nodes last.
+        Any LocalFile objects left without File objects are cleaned up separately by
+        LocalFileQueryset.delete_orphan_file_objects.
+        """
+        # Filter on the channel as well as the tree, in case another tree
+        # has erroneously been given the same tree_id.
+        nodes = ContentNode.objects.filter(
+            tree_id=self.root.tree_id, channel_id=self.id
+        )
+
+        # Imported here, as the signals module imports from this module
+        from kolibri.core.content.signals import delete_node_notifications
+
+        node_ids = list(nodes.values_list("id", flat=True))
+
+        with transaction.atomic():
+            AssessmentMetaData.objects.filter(contentnode__in=nodes).delete()
+            File.objects.filter(contentnode__in=nodes).delete()
+            for field in ContentNode._meta.local_many_to_many:
+                through = field.remote_field.through
+                query = Q()
+                for through_field in through._meta.fields:
+                    if through_field.related_model is ContentNode:
+                        query |= Q(**{"{}__in".format(through_field.name): nodes})
+                through.objects.filter(query).delete()
+            # The channel references the root node, so delete it before the nodes
+            self.delete()
+            # Nothing references the nodes any more, so delete them directly,
+            # without collecting them for a cascading delete. This deliberately
+            # does not send the ContentNode pre_delete and post_delete signals,
+            # any cleanup done by their receivers must be done in bulk here.
+            nodes.order_by()._raw_delete(nodes.db)
+        # Do the cleanup of the ContentNode pre_delete signal handler in bulk,
+        # once the tree has been deleted.
+        delete_node_notifications(node_ids)
         ContentCacheKey.update_cache_key()
 
 
@@ -443,20 +561,23 @@ class ContentRequestStatus(ChoicesEnum):
 
 
 def _hex_uuid_str():
-    return str(uuid.uuid4().hex)
+    # Equivalent to uuid.uuid4().hex, without constructing a UUID object
+    b = bytearray(os.urandom(16))
+    # Set the version to 4 and the variant to RFC 4122
+    b[6] = (b[6] & 0x0F) | 0x40
+    b[8] = (b[8] & 0x3F) | 0x80
+    return b.hex()
 
 
 class ContentRequestManager(models.Manager):
-    request_type = None
-
     def get_queryset(self):
         """
         Automatically filters on the request type for use with proxy models
         :rtype: django.db.models.QuerySet
         """
         queryset = super(ContentRequestManager, self).get_queryset()
-        if self.request_type is not None:
-            queryset = queryset.filter(type=self.request_type)
+        if self.model._request_type is not None:
+            queryset = queryset.filter(type=self.model._request_type)
         return queryset
 
 
@@ -493,15 +614,27 @@ class ContentRequest(models.Model):
 
     objects = ContentRequestManager()
 
+    # the request type for the proxy models, used to set the type on save and to
+    # filter the queryset of the manager
+    _request_type = None
+
     class Meta:
         unique_together = ("type", "source_model", "source_id", "contentnode_id")
         ordering = ("requested_at",)
+        indexes = [
+            # Supports the request processing loops that fetch requests of a type
+            # by status, in the order they were requested
+            models.Index(
+                fields=["type", "status", "requested_at"], name="creq_type_status_idx"
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         """
         Save override to set type for the proxy models
         """
-        self.type = getattr(self.__class__.objects, "request_type", None)
+        if self._request_type is not None:
+            self.type = self._request_type
         return super(ContentRequest, self).save(*args, **kwargs)
 
     @classmethod
@@ -515,7 +648,7 @@ class ContentRequest(models.Model):
             facility_id=user.facility_id,
             source_model=FacilityUser.morango_model_name,
             source_id=user.id,
-            type=getattr(cls.objects, "request_type", None),
+            type=cls._request_type,
             reason=ContentRequestReason.UserInitiated,
             status=ContentRequestStatus.Pending,
         )
@@ -535,31 +668,27 @@ class ContentRequest(models.Model):
         return self.metadata.get("total_progress", 0) if self.metadata else 0
 
 
-class ContentDownloadRequestManager(ContentRequestManager):
-    request_type = ContentRequestType.Download
-
-
 class ContentDownloadRequest(ContentRequest):
     """
     Proxy model for the Download content request type
     """
 
-    objects = ContentDownloadRequestManager()
+    objects = ContentRequestManager()
+
+    _request_type = ContentRequestType.Download
 
     class Meta:
         proxy = True
 
 
-class ContentRemovalRequestManager(ContentRequestManager):
-    request_type = ContentRequestType.Removal
-
-
 class ContentRemovalRequest(ContentRequest):
     """
     Proxy model for the Removal content request type
     """
 
-    objects = ContentRemovalRequestManager()
+    objects = ContentRequestManager()
+
+    _request_type = ContentRequestType.Removal
 
     class Meta:
         proxy = True
@@ -2,6 +2,7 @@ from django.db.models import F
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
+from .models import BATCH_SIZE
 from .models import ChannelMetadata
 from .models import ContentNode
 from kolibri.core.auth.models import Facility
@@ -11,13 +12,25 @@ from kolibri.core.device.utils import get_device_setting
 from kolibri.core.notifications.models import LearnerProgressNotification
 
 
+def delete_node_notifications(node_ids):
+    """
+    Delete all notifications objects whose contentnode is one of the given nodes.
+    Notifications can be in a separate database, so filter by batches of ids,
+    using uuidin to avoid the SQLite limit on the number of query variables.
+    """
+    for i in range(0, len(node_ids), BATCH_SIZE):
+        LearnerProgressNotification.objects.filter(
+            contentnode_id__uuidin=node_ids[i : i + BATCH_SIZE]
+        ).delete()
+
+
 @receiver(pre_delete, sender=ContentNode)
 def cascade_delete_node(sender, instance=None, *args, **kwargs):
     """
     For a given node, we delete all notifications
     objects whose contentnode is the instance's node..
     """
-    LearnerProgressNotification.objects.filter(contentnode_id=instance.id).delete()
+    delete_node_notifications([instance.id])
 
 
 @receiver(pre_delete, sender=ChannelMetadata)
@@ -2,6 +2,7 @@
 To run this test, type this in command line <kolibri manage test -- kolibri.core.content>
 """
 import datetime
+import sqlite3
 import time
 import unittest
 import uuid
@@ -10,6 +11,9 @@ import mock
 import requests
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+from django.db.models import Max
 from django.test import LiveServerTestCase
 from django.test import TestCase
 from django.urls import reverse
@@ -28,6 +32,7 @@ from kolibri.core.device.models import DevicePermissions
 from kolibri.core.device.models import DeviceSettings
 from kolibri.core.logger.models import ContentSessionLog
 from kolibri.core.logger.models import ContentSummaryLog
+from kolibri.core.notifications.models import LearnerProgressNotification
 from kolibri.utils.tests.helpers import override_option
 
 DUMMY_PASSWORD = "password"
@@ -172,6 +177,9 @@ class ContentNodeTestBase(object):
             content.ContentNode.objects.filter(channel_id=channel_id).exists()
         )
         self.assertFalse(content.File.objects.all().exists())
+        self.assertFalse(content.ChannelMetadata.objects.filter(id=channel_id).exists())
+        self.assertFalse(content.ContentNode.tags.through.objects.exists())
+        self.assertFalse(content.ContentNode.has_prerequisite.through.objects.exists())
 
 
 class ContentNodeQuerysetTestCase(TestCase):
@@ -201,6 +209,203 @@ class ContentNodeQuerysetTestCase(TestCase):
             content.ContentNode.objects.filter_by_uuids(content_ids).count(), 0
         )
 
+    def test_dedupe_by_content_id(self):
+        deduped = content.ContentNode.objects.dedupe_by_content_id(use_distinct=False)
+        content_ids = list(deduped.values_list("content_id", flat=True))
+        self.assertEqual(len(content_ids), len(set(content_ids)))
+        self.assertEqual(
+            set(content_ids),
+            set(content.ContentNode.objects.values_list("content_id", flat=True)),
+        )
+
+    def test_dedupe_by_content_id_keeps_lowest_id(self):
+        for node in content.ContentNode.objects.dedupe_by_content_id(
+            use_distinct=False
+        ):
+            self.assertFalse(
+                content.ContentNode.objects.filter(
+                    content_id=node.content_id, id__lt=node.id
+                ).exists()
+            )
+
+    def test_dedupe_by_content_id_filtered_queryset(self):
+        queryset = content.ContentNode.objects.exclude(
+            id__in=content.ContentNode.objects.dedupe_by_content_id(
+                use_distinct=False
+            ).values("id")
+        )
+        self.assertTrue(queryset.exists())
+        self.assertEqual(
+            queryset.dedupe_by_content_id(use_distinct=False).count(),
+            queryset.count(),
+        )
+
+    def test_dedupe_by_content_id_assume_unique(self):
+        queryset = content.ContentNode.objects.all()
+        self.assertIs(queryset.dedupe_by_content_id(assume_unique=True), queryset)
+
+    def test_dedupe_by_content_id_filtered_by_pk(self):
+        node = content.ContentNode.objects.first()
+        queryset = content.ContentNode.objects.filter(id=node.id)
+        self.assertIs(queryset.dedupe_by_content_id(use_distinct=False), queryset)
+
+    def test_is_filtered_by_pk_does_not_change_query(self):
+        node = content.ContentNode.objects.first()
+        queryset = content.ContentNode.objects.filter(id=node.id)
+        refcount = dict(queryset.query.alias_refcount)
+        self.assertTrue(queryset._is_filtered_by_pk())
+        self.assertEqual(queryset.query.alias_refcount, refcount)
+
+    def test_dedupe_by_content_id_filtered_by_joined_pk(self):
+        node = content.ContentNode.objects.filter(parent__isnull=False).first()
+        queryset = content.ContentNode.objects.filter(parent__children__id=node.id)
+        self.assertGreater(queryset.count(), 1)
+        deduped = queryset.dedupe_by_content_id(use_distinct=False)
+        self.assertIsNot(deduped, queryset)
+        content_ids = list(deduped.values_list("content_id", flat=True))
+        self.assertEqual(len(content_ids), len(set(content_ids)))
+
+    def test_get_descendant_content_ids_other_tree(self):
+        topic = content.ContentNode.objects.filter(
+            kind=content_kinds.TOPIC, rght__gt=F("lft") + 1
+        ).first()
+        expected = set(
+            content.ContentNode.objects.filter(
+                tree_id=topic.tree_id, lft__gt=topic.lft, rght__lt=topic.rght
+            )
+            .exclude(kind=content_kinds.TOPIC)
+            .values_list("content_id", flat=True)
+        )
+        self.assertTrue(expected)
+        other_tree_id = (
+            content.ContentNode.objects.aggregate(Max("tree_id"))["tree_id__max"] + 1
+        )
+        # A node in another tree, whose lft falls within the range of the topic
+        content.ContentNode.objects.bulk_create(
+            [
+                content.ContentNode(
+                    id=uuid.uuid4().hex,
+                    content_id=uuid.uuid4().hex,
+                    channel_id=uuid.uuid4().hex,
+                    title="other tree",
+                    kind=content_kinds.VIDEO,
+                    tree_id=other_tree_id,
+                    lft=topic.lft + 1,
+                    rght=topic.lft + 2,
+                    level=0,
+                )
+            ]
+        )
+        self.assertEqual(set(topic.get_descendant_content_ids()), expected)
+
+    def test_delete_large_tree(self):
+        tree_id = (
+            content.ContentNode.objects.aggregate(Max("tree_id"))["tree_id__max"] + 1
+        )
+        channel_id = uuid.uuid4().hex
+        num_children = 1000
+        root = content.ContentNode(
+            id=uuid.uuid4().hex,
+            content_id=uuid.uuid4().hex,
+            channel_id=channel_id,
+            title="root",
+            kind=content_kinds.TOPIC,
+            tree_id=tree_id,
+            lft=1,
+            rght=2 * num_children + 2,
+            level=0,
+        )
+        children = [
+            content.ContentNode(
+                id=uuid.uuid4().hex,
+                content_id=uuid.uuid4().hex,
+                channel_id=channel_id,
+                parent_id=root.id,
+                title="child",
+                kind=content_kinds.VIDEO,
+                tree_id=tree_id,
+                lft=2 * i + 2,
+                rght=2 * i + 3,
+                level=1,
+            )
+            for i in range(num_children)
+        ]
+        content.ContentNode.objects.bulk_create([root] + children)
+        channel = content.ChannelMetadata.objects.create(
+            id=channel_id, name="large", min_schema_version="1", root=root
+        )
+        LearnerProgressNotification.objects.bulk_create(
+            [
+                LearnerProgressNotification(
+                    user_id=self.admin.id,
+                    classroom_id=self.facility.id,
+                    contentnode_id=child.id,
+                )
+                for child in children
+            ]
+        )
+        # Apply the lower limit on query variables of older SQLite versions
+        limited = [
+            conn.connection
+            for conn in connections.all()
+            if conn.vendor == "sqlite"
+            and conn.connection is not None
+            and hasattr(conn.connection, "setlimit")
+        ]
+        limits = [
+            conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999) for conn in limited
+        ]
+        try:
+            channel.delete_content_tree_and_files()
+        finally:
+            for conn, limit in zip(limited, limits):
+                conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, limit)
+        self.assertFalse(content.ContentNode.objects.filter(tree_id=tree_id).exists())
+        self.assertFalse(content.ChannelMetadata.objects.filter(id=channel_id).exists())
+        self.assertFalse(LearnerProgressNotification.objects.exists())
+
+    def test_manager_ordering(self):
+        sql = str(content.ContentNode.objects.all().query)
+        self.assertEqual(sql.count("ORDER BY"), 1)
+        self.assertEqual(
+            sql.split("ORDER BY")[1].replace('"content_contentnode".', "").strip(),
+            '"tree_id" ASC, "lft" ASC',
+        )
+
+    def test_manager_ordering_cleared(self):
+        self.assertNotIn("ORDER BY", str(content.ContentNode.objects.order_by().query))
+
+    def test_build_tree_nodes_deep_tree(self):
+        depth = 2000
+        data = {"title": "leaf"}
+        for i in range(depth - 1):
+            data = {"title": str(i), "children": [data]}
+        nodes = content.ContentNode.objects.build_tree_nodes(data)
+        self.assertEqual(len(nodes), depth)
+        for level, node in enumerate(nodes):
+            self.assertEqual(node.level, level)
+            self.assertEqual(node.lft, level + 1)
+            self.assertEqual(node.rght, 2 * depth - level)
+
+    def test_build_tree_nodes_siblings(self):
+        data = {
+            "title": "root",
+            "children": [
+                {"title": "a", "children": [{"title": "a1"}]},
+                {"title": "b"},
+            ],
+        }
+        nodes = content.ContentNode.objects.build_tree_nodes(data)
+        self.assertEqual(
+            [(node.title, node.level, node.lft, node.rght) for node in nodes],
+            [
+                ("root", 0, 1, 8),
+                ("a", 1, 2, 5),
+                ("a1", 2, 3, 4),
+                ("b", 1, 6, 7),
+            ],
+        )
+
 
 kind_activity_map = {
     content_kinds.EXERCISE: "practice",
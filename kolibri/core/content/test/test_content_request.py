@@ -1,3 +1,5 @@
+import uuid
+
 from django.http.request import HttpRequest
 from django.test import TestCase
 from django.urls import reverse
@@ -8,8 +10,67 @@ from rest_framework.test import APITestCase
 from ..serializers import ContentDownloadRequestSerializer
 from kolibri.core.auth.models import Facility
 from kolibri.core.auth.models import FacilityUser
+from kolibri.core.content.models import _hex_uuid_str
 from kolibri.core.content.models import ContentDownloadRequest
+from kolibri.core.content.models import ContentRemovalRequest
+from kolibri.core.content.models import ContentRequest
 from kolibri.core.content.models import ContentRequestStatus
+from kolibri.core.content.models import ContentRequestType
+
+
+class HexUUIDStrTestCase(TestCase):
+    def test_is_valid_uuid4_hex(self):
+        value = _hex_uuid_str()
+        self.assertEqual(len(value), 32)
+        parsed = uuid.UUID(hex=value)
+        self.assertEqual(parsed.hex, value)
+        self.assertEqual(parsed.version, 4)
+        self.assertEqual(parsed.variant, uuid.RFC_4122)
+
+    def test_is_unique(self):
+        self.assertNotEqual(_hex_uuid_str(), _hex_uuid_str())
+
+
+class ContentRequestTypeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = Facility.objects.create(name="a")
+        cls.user = FacilityUser.objects.create(
+            username="learner", password="password", facility=cls.facility
+        )
+
+    def _create(self, model, **kwargs):
+        request = model.build_for_user(self.user)
+        request.contentnode_id = uuid.uuid4().hex
+        for key, value in kwargs.items():
+            setattr(request, key, value)
+        request.save()
+        return ContentRequest.objects.get(id=request.id)
+
+    def test_download_request_type(self):
+        request = self._create(ContentDownloadRequest)
+        self.assertEqual(request.type, ContentRequestType.Download)
+
+    def test_removal_request_type(self):
+        request = self._create(ContentRemovalRequest, type=ContentRequestType.Download)
+        self.assertEqual(request.type, ContentRequestType.Removal)
+
+    def test_base_request_keeps_type(self):
+        request = self._create(ContentRequest, type=ContentRequestType.Removal)
+        self.assertEqual(request.type, ContentRequestType.Removal)
+
+    def test_proxy_managers_filter_by_type(self):
+        download = self._create(ContentDownloadRequest)
+        removal = self._create(ContentRemovalRequest)
+        self.assertEqual(
+            list(ContentDownloadRequest.objects.values_list("id", flat=True)),
+            [download.id],
+        )
+        self.assertEqual(
+            list(ContentRemovalRequest.objects.values_list("id", flat=True)),
+            [removal.id],
+        )
+        self.assertEqual(ContentRequest.objects.count(), 2)
 
 
 class ContentDownloadRequestSerializerTestCase(TestCase):
@@ -81,6 +81,19 @@ class UnavailableContentDeletion(TransactionTestCase):
         self.assertEqual(os.path.exists(self.path), False)
         self.assertEqual(LocalFile.objects.get_unused_files().count(), 0)
 
+    def test_delete_unused_files_stopped_early(self):
+        generator = LocalFile.objects.delete_unused_files()
+        next(generator)
+        generator.close()
+        self.assertEqual(os.path.exists(self.path), False)
+        self.assertFalse(LocalFile.objects.get(id=self.hash).available)
+
+    def test_delete_stored_file(self):
+        self.assertTrue(self.stored_local_file.delete_stored_file())
+        self.assertFalse(self.stored_local_file.available)
+        self.assertEqual(os.path.exists(self.path), False)
+        self.assertFalse(LocalFile.objects.get(id=self.hash).available)
+
     def test_dont_delete_used_stored_files(self):
         available_contentnode = ContentNode.objects.create(
             title="wow",
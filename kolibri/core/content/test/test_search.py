@@ -67,6 +67,15 @@ class ConstrainedBitMaskTestCase(TestCase):
             "{} {}".format(field, label),
         )
 
+    def test_bitmasks_repeated_label(self):
+        for field in metadata_lookup.keys():
+            label = metadata_lookup[field][-1]
+            self.assertEqual(
+                ContentNode.objects.filter(**{field + "__contains": label}).count(),
+                ContentNode.objects.has_all_labels(field, [label, label]).count(),
+                "{} {}".format(field, label),
+            )
+
     def test_bitmasks_and_not_or(self):
         for field in metadata_lookup.keys():
             node = ContentNode.objects.create(
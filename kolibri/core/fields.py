@@ -99,20 +99,28 @@ class DateTimeTzField(Field):
 
 
 class JSONField(JSONFieldBase):
+    def __init__(self, *args, **kwargs):
+        super(JSONField, self).__init__(*args, **kwargs)
+        # json.loads instantiates a new decoder on every call when it is passed
+        # keyword arguments, so create the decoder once and reuse it for every value.
+        load_kwargs = self.load_kwargs.copy()
+        decoder_class = load_kwargs.pop("cls", json.JSONDecoder)
+        self._decoder = decoder_class(**load_kwargs)
+
+    def _loads(self, value):
+        try:
+            return self._decoder.decode(value)
+        except ValueError:
+            return value
+
     def from_db_value(self, value, expression, connection, context):
         if isinstance(value, str):
-            try:
-                return json.loads(value, **self.load_kwargs)
-            except ValueError:
-                pass
+            return self._loads(value)
 
         return value
 
     def to_python(self, value):
         if isinstance(value, str):
-            try:
-                return json.loads(value, **self.load_kwargs)
-            except ValueError:
-                pass
+            return self._loads(value)
 
         return value
@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+from kolibri.core.fields import JSONField
+
+
+class JSONFieldTestCase(SimpleTestCase):
+    def test_from_db_value(self):
+        field = JSONField()
+        self.assertEqual(
+            field.from_db_value('{"a": [1, 2]}', None, None, None), {"a": [1, 2]}
+        )
+
+    def test_from_db_value_invalid(self):
+        field = JSONField()
+        self.assertEqual(field.from_db_value("{", None, None, None), "{")
+
+    def test_to_python_load_kwargs(self):
+        field = JSONField(load_kwargs={"strict": False})
+        self.assertEqual(field.to_python('["a\tb"]'), ["a\tb"])
+
+    def test_to_python_strict(self):
+        field = JSONField()
+        self.assertEqual(field.to_python('["a\tb"]'), '["a\tb"]')
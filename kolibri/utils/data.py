@@ -50,10 +50,14 @@ def bytes_from_humans(size, suffix="B"):
 class ChoicesEnum(object):
     @classmethod
     def choices(cls):
-        choices_list = [
-            (getattr(cls, m), "{}".format(m)) for m in cls.__dict__ if m[0] != "_"
-        ]
-        return tuple(sorted(choices_list))
+        # Cache on the class itself, checking its own __dict__ so that
+        # subclasses do not pick up the choices of their parent
+        if "_choices" not in cls.__dict__:
+            choices_list = [
+                (getattr(cls, m), "{}".format(m)) for m in cls.__dict__ if m[0] != "_"
+            ]
+            cls._choices = tuple(sorted(choices_list))
+        return cls._choices
 
     @classmethod
     def max_length(cls):
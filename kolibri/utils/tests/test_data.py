@@ -89,3 +89,13 @@ class IntegerChoices(ChoicesEnum):
 def test_choices_enum():
     assert IntegerChoices.choices() == ((1, "ONE"), (2, "TWO"), (3, "THREE"))
     assert IntegerChoices.max_length() == 1
+
+
+class MoreIntegerChoices(IntegerChoices):
+    FOUR = 4
+
+
+def test_choices_enum_cached():
+    assert IntegerChoices.choices() is IntegerChoices.choices()
+    assert MoreIntegerChoices.choices() == ((4, "FOUR"),)
+    assert IntegerChoices.choices() == ((1, "ONE"), (2, "TWO"), (3, "THREE"))